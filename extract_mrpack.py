@@ -4,6 +4,8 @@
 # Author: SOG (SomeOtherGod)
 
 import argparse
+import asyncio
+import importlib.util
 import zipfile
 import sys
 import json
@@ -11,14 +13,34 @@ import shutil
 import hashlib
 from pathlib import Path
 import concurrent.futures
-import itertools
+import multiprocessing
 import os
 import time
+import threading
+import queue
+import struct
+import zlib
 
 try:
-    import requests
+    import urllib3
+    from urllib3.util.retry import Retry
 except Exception:
-    requests = None
+    urllib3 = None
+
+try:
+    # orjson parses bytes directly and is much faster for big indexes; fall back to the stdlib
+    import orjson
+    _json_loads = orjson.loads
+except Exception:
+    _json_loads = json.loads
+
+try:
+    # httpx is only needed for --async; HTTP/2 additionally needs the h2 package (pip install httpx[http2])
+    import httpx
+except Exception:
+    httpx = None
+
+_HTTP2 = importlib.util.find_spec('h2') is not None
 
 try:
     # import tqdm optionally;
@@ -26,12 +48,69 @@ try:
 except Exception:
     _tqdm = None
 
-CHUNK_SIZE = 8192
+CHUNK_SIZE = 1 << 20
+MAX_WORKERS = min(8, (os.cpu_count() or 4) * 2)
+# buffers in flight per download between the network reader and the writer/hasher
+PIPELINE_DEPTH = 4
+# files larger than this are fetched as several concurrent range requests when the server allows it
+RANGED_THRESHOLD = 32 << 20
+RANGED_PARTS = 4
+
+
+def _make_pool():
+    """Create a shared urllib3 PoolManager so downloads reuse pooled keep-alive connections.
+    The per-host pool is sized for every worker running a ranged download at once, so no
+    connection is opened just to be thrown away after one use.
+    """
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+    # files are hashed as served; don't let the server hand us a re-encoded body
+    headers = {'Accept-Encoding': 'identity'}
+    return urllib3.PoolManager(num_pools=4, maxsize=MAX_WORKERS * RANGED_PARTS, retries=retries, headers=headers)
+
+
+_HTTP = _make_pool() if urllib3 is not None else None
+_TIMEOUT = urllib3.Timeout(connect=5, read=30) if urllib3 is not None else None
+
+
+# ASCII translate table for sanitize_for_filename: alnum and " ._-()" map to themselves, everything else to "_"
+_FILENAME_TABLE = str.maketrans({i: (chr(i) if chr(i).isalnum() or chr(i) in " ._-()" else "_") for i in range(128)})
+
+
+# directories already created during this run, so repeated files in one folder skip the mkdir syscalls;
+# cleared at the start of every process_mrpack call
+_MKDIR_CACHE: set[str] = set()
+_MKDIR_LOCK = threading.Lock()
+
+
+def ensure_dir(p: str):
+    """os.makedirs(p, exist_ok=True), skipped when p was already created during this run."""
+    if p in _MKDIR_CACHE:
+        return
+    os.makedirs(p, exist_ok=True)
+    with _MKDIR_LOCK:
+        _MKDIR_CACHE.add(p)
+
+
+def _create_file(path, **kwargs):
+    """open(path, 'wb', **kwargs). If the parent directory disappeared after ensure_dir cached it,
+    create it again and retry once.
+    """
+    try:
+        return open(path, 'wb', **kwargs)
+    except FileNotFoundError:
+        parent = os.path.dirname(os.fspath(path))
+        with _MKDIR_LOCK:
+            _MKDIR_CACHE.discard(parent)
+        ensure_dir(parent)
+        return open(path, 'wb', **kwargs)
 
 
 def sanitize_for_filename(name: str) -> str:
     """Make a filesystem-safe folder name from the pack name."""
     # keep alnum and a few punctuation chars, replace others with underscore
+    if name.isascii():
+        return name.translate(_FILENAME_TABLE).strip()
+    # non-ASCII letters and digits are kept too, which the table can't express
     return "".join(c if (c.isalnum() or c in " ._-()") else "_" for c in name).strip()
 
 
@@ -39,84 +118,290 @@ def find_index_and_overrides(z: zipfile.ZipFile):
     """Return (index_member_name or None, has_overrides_bool, overrides_prefix)
     overrides_prefix is the exact path inside the zip that corresponds to the overrides root (e.g. 'overrides/') or None.
     """
-    namelist = z.namelist()
     index_member = None
     overrides_prefix = None
 
-    # find modrinth.index.json
-    for name in namelist:
-        if name.replace('\\', '/').split('/')[-1].lower() == 'modrinth.index.json':
-            index_member = name
-            break
-
-    # find overrides root
-    for name in namelist:
-        n = name.replace('\\', '/')
-        if n.startswith('overrides/') or n == 'overrides' or n == 'overrides/':
+    # the index normally sits at the archive root: a dict lookup instead of comparing names
+    try:
+        index_member = z.getinfo('modrinth.index.json').filename
+    except KeyError:
+        pass
+
+    # single pass over the central directory; stop as soon as both are known
+    for info in z.infolist():
+        name = info.filename.replace('\\', '/')
+        if index_member is None and name.rsplit('/', 1)[-1].lower() == 'modrinth.index.json':
+            index_member = info.filename
+        if overrides_prefix is None and (name.startswith('overrides/') or name == 'overrides'):
             overrides_prefix = 'overrides/'
+        if index_member is not None and overrides_prefix is not None:
             break
 
     return index_member, (overrides_prefix is not None), overrides_prefix
 
 
+def _zip_fileno(z: zipfile.ZipFile):
+    """Return the OS file descriptor backing z, or None if positional reads can't be used."""
+    if not hasattr(os, 'pread'):
+        return None
+    try:
+        return z.fp.fileno()
+    except Exception:
+        return None
+
+
+# members _fast_extract can decode itself
+_FAST_COMPRESSION = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+
+def _fast_extract(fd: int, info: zipfile.ZipInfo, dst):
+    """Extract a stored or deflated member straight from the archive with os.pread and zlib,
+    bypassing ZipExtFile and its shared-file locking. Size and CRC are still checked, like ZipFile.open would.
+    """
+    # local file header: 30 fixed bytes, then filename and extra field of variable length
+    header = os.pread(fd, 30, info.header_offset)
+    if len(header) != 30 or header[:4] != b'PK\x03\x04':
+        raise zipfile.BadZipFile(f"Bad local file header for {info.filename}")
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    offset = info.header_offset + 30 + name_len + extra_len
+    remaining = info.compress_size
+    # raw deflate stream (no zlib header), as stored in zip files
+    d = zlib.decompressobj(-15) if info.compress_type == zipfile.ZIP_DEFLATED else None
+    crc = 0
+    size = 0
+
+    def emit(out):
+        nonlocal crc, size
+        # refuse to write past the declared size, like ZipExtFile; stops zip bombs before they hit the disk
+        if size + len(out) > info.file_size:
+            raise zipfile.BadZipFile(f"Size mismatch for {info.filename}")
+        dst.write(out)
+        crc = zlib.crc32(out, crc)
+        size += len(out)
+
+    while remaining:
+        data = os.pread(fd, min(remaining, CHUNK_SIZE), offset)
+        if not data:
+            raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+        offset += len(data)
+        remaining -= len(data)
+        if d is None:
+            emit(data)
+            continue
+        # never inflate more than one byte past what is still allowed, so overshoot is caught cheaply
+        out = d.decompress(data, min(CHUNK_SIZE, info.file_size - size + 1))
+        emit(out)
+        while d.unconsumed_tail:
+            out = d.decompress(d.unconsumed_tail, min(CHUNK_SIZE, info.file_size - size + 1))
+            emit(out)
+    if d is not None:
+        emit(d.flush())
+        if not d.eof:
+            raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+    if size != info.file_size:
+        raise zipfile.BadZipFile(f"Size mismatch for {info.filename}")
+    if crc != info.CRC:
+        raise zipfile.BadZipFile(f"Bad CRC-32 for {info.filename}")
+
+
+def _is_safe_relpath(relpath: str) -> bool:
+    """True if relpath ('/'-separated) stays inside the directory it gets joined to."""
+    return not (relpath.startswith('/') or os.path.splitdrive(relpath)[0] or '..' in relpath.split('/'))
+
+
+def _extract_member(z: zipfile.ZipFile, info: zipfile.ZipInfo, target: str):
+    """Write a single member to target. The parent directory must already exist."""
+    if info.file_size == 0:
+        # nothing to decompress; just create the empty file
+        _create_file(target).close()
+        return
+    fd = _zip_fileno(z)
+    if fd is not None and info.compress_type in _FAST_COMPRESSION and not info.flag_bits & 0x1:
+        with _create_file(target) as dst:
+            _fast_extract(fd, info, dst)
+    else:
+        with z.open(info) as src, _create_file(target) as dst:
+            shutil.copyfileobj(src, dst, min(info.file_size, CHUNK_SIZE))
+
+
 def extract_overrides(z: zipfile.ZipFile, overrides_prefix: str, dest: Path):
-    """Extract all files under overrides_prefix into dest, preserving subpaths but stripping the overrides/ prefix."""
-    members = [n for n in z.namelist() if n.replace('\\', '/').startswith(overrides_prefix)]
+    """Extract all files under overrides_prefix into dest, preserving subpaths but stripping the overrides/ prefix.
+    Files are extracted on a thread pool with one ZipFile handle per thread, since handles can't be shared safely.
+    """
+    members = [i for i in z.infolist() if i.filename.replace('\\', '/').startswith(overrides_prefix)]
     if not members:
         return 0
-    count = 0
-    for member in members:
-        relpath = member.replace('\\', '/')[len(overrides_prefix):]
+    # plain string paths: os.path.join is much cheaper than building a Path per member
+    dest_str = os.fspath(dest)
+    # keyed by target: duplicate member names must not be written by two threads at once,
+    # and like a sequential extraction the last one wins
+    jobs = {}
+    dirs = set()
+    for info in members:
+        relpath = info.filename.replace('\\', '/')[len(overrides_prefix):]
         if not relpath:
             continue
-        target = dest.joinpath(relpath)
-        if member.endswith('/'):
-            target.mkdir(parents=True, exist_ok=True)
+        if not _is_safe_relpath(relpath):
+            print(f"Skipping unsafe path in overrides: {info.filename}")
             continue
-        target.parent.mkdir(parents=True, exist_ok=True)
-        with z.open(member) as src, open(target, 'wb') as dst:
-            shutil.copyfileobj(src, dst)
-        count += 1
-    return count
+        target = os.path.join(dest_str, relpath)
+        if info.is_dir():
+            dirs.add(target)
+            continue
+        dirs.add(os.path.dirname(target))
+        jobs[target] = info
+
+    # create all directories up front so the workers only ever open files
+    for d in sorted(dirs):
+        ensure_dir(d)
+
+    jobs = [(info, target) for target, info in jobs.items()]
+    workers = min(8, os.cpu_count() or 4)
+    if z.filename is None or workers < 2 or len(jobs) < 2:
+        for info, target in jobs:
+            _extract_member(z, info, target)
+        return len(jobs)
+
+    local = threading.local()
+    handles = []
+
+    def work(job):
+        zf = getattr(local, 'zf', None)
+        if zf is None:
+            zf = zipfile.ZipFile(z.filename, 'r')
+            local.zf = zf
+            handles.append(zf)
+        _extract_member(zf, *job)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+            # consume the iterator so worker exceptions are raised here
+            for _ in ex.map(work, jobs):
+                pass
+    finally:
+        for zf in handles:
+            zf.close()
+    return len(jobs)
+
+
+def _stream_response(raw, sinks, progress=None):
+    """Copy a urllib3 response into every callable in sinks (file write, hash updates),
+    reporting each chunk's size to progress if given.
+    A helper thread reads the socket into a small pool of recycled buffers while this thread
+    writes and hashes, so hashing doesn't stall the network read (hashlib releases the GIL
+    on large updates).
+    """
+    free = queue.Queue()
+    for _ in range(PIPELINE_DEPTH):
+        # keep a memoryview per buffer so chunks are sliced without copying
+        buf = bytearray(CHUNK_SIZE)
+        free.put((buf, memoryview(buf)))
+    filled = queue.Queue()
+
+    def reader():
+        try:
+            while True:
+                item = free.get()
+                if item is None:
+                    return
+                n = raw.readinto(item[0])
+                filled.put((item, n))
+                if not n:
+                    return
+        except BaseException as e:
+            filled.put((e, 0))
+
+    t = threading.Thread(target=reader, daemon=True)
+    t.start()
+    try:
+        while True:
+            item, n = filled.get()
+            if isinstance(item, BaseException):
+                raise item
+            if not n:
+                break
+            chunk = item[1][:n]
+            for sink in sinks:
+                sink(chunk)
+            if progress:
+                progress(n)
+            free.put(item)
+    finally:
+        # wake the reader if it is waiting for a buffer; a blocked socket read ends when the response is closed
+        free.put(None)
+
+
+def _preallocate(fd: int, size: int):
+    """Reserve size bytes for fd up front so the filesystem can allocate the file in one extent.
+    Best effort: silently skipped where posix_fallocate is missing or unsupported.
+    """
+    if not hasattr(os, 'posix_fallocate'):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError:
+        pass
+
+
+def _make_hashers(expected_hashes: dict | None, strict: bool):
+    """Return (sha1, sha512) hash objects for the hashes that should be checked, None for the others."""
+    want_sha1 = bool(expected_hashes) and 'sha1' in expected_hashes
+    # sha1 is hardware accelerated on most CPUs, sha512 is not; only pay for both when asked to
+    want_sha512 = bool(expected_hashes) and 'sha512' in expected_hashes and (strict or not want_sha1)
+    h1 = hashlib.sha1() if want_sha1 else None
+    h512 = hashlib.sha512() if want_sha512 else None
+    return h1, h512
 
 
-def download_file(url: str, dest: Path, expected_hashes: dict | None = None, position: int | None = None, total_size: int | None = None):
-    """Download url to dest with per-file tqdm progress bar and optional hash verification.
+def _verify_hashes(dest: Path, expected_hashes: dict | None, h1, h512):
+    """Compare finished hash objects against expected_hashes; raises ValueError on mismatch."""
+    if expected_hashes:
+        if 'sha1' in expected_hashes and h1:
+            got = h1.hexdigest()
+            if got.lower() != expected_hashes['sha1'].lower():
+                raise ValueError(f"SHA1 mismatch for {dest}: expected {expected_hashes['sha1']}, got {got}")
+        if 'sha512' in expected_hashes and h512:
+            got = h512.hexdigest()
+            if got.lower() != expected_hashes['sha512'].lower():
+                raise ValueError(f"SHA512 mismatch for {dest}: expected {expected_hashes['sha512']}, got {got}")
+
+
+def download_file(url: str, dest: Path, expected_hashes: dict | None = None, progress=None, total_size: int | None = None, strict: bool = False):
+    """Download url to dest with optional hash verification. progress, if given, is called with
+    the number of bytes received for each chunk (used to drive the shared progress bar).
+    When both sha1 and sha512 are expected only sha1 is checked unless strict is set.
     Returns True on success; raises on failure.
     """
-    if requests is None:
-        raise RuntimeError("requests library is required to download files. Install with: pip install -r requirements.txt")
-    if _tqdm is None:
-        raise RuntimeError("tqdm is required for progress bars. Install with: pip install -r requirements.txt")
+    if urllib3 is None:
+        raise RuntimeError("urllib3 is required to download files. Install with: pip install -r requirements.txt")
 
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    h1 = hashlib.sha1() if expected_hashes and 'sha1' in expected_hashes else None
-    h512 = hashlib.sha512() if expected_hashes and 'sha512' in expected_hashes else None
+    ensure_dir(os.fspath(dest.parent))
+    h1, h512 = _make_hashers(expected_hashes, strict)
 
     try:
-        with requests.get(url, stream=True, timeout=30) as r:
-            r.raise_for_status()
+        r = _HTTP.request('GET', url, preload_content=False, timeout=_TIMEOUT)
+        try:
+            if r.status >= 400:
+                raise RuntimeError(f"HTTP {r.status} for {url}")
             # prefer provided total_size, fallback to Content-Length header (use 0 when missing)
             try:
                 total = int(total_size) if total_size else int(r.headers.get('Content-Length', 0))
             except Exception:
                 total = 0
 
-            # create progress bar
-            pbar = _tqdm(total=total, unit='B', unit_scale=True, unit_divisor=1024, desc=dest.name, position=position, leave=False)
-            try:
-                with open(dest, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
-                        if not chunk:
-                            continue
-                        f.write(chunk)
-                        if h1:
-                            h1.update(chunk)
-                        if h512:
-                            h512.update(chunk)
-                        pbar.update(len(chunk))
-            finally:
-                pbar.close()
+            with _create_file(dest, buffering=CHUNK_SIZE) as f:
+                if total:
+                    _preallocate(f.fileno(), total)
+                sinks = [f.write] + [h.update for h in (h1, h512) if h]
+                _stream_response(r, sinks, progress)
+                # drop any preallocated tail if the body was shorter than expected
+                f.truncate()
+        except BaseException:
+            # don't hand a half-read connection back to the pool
+            r.close()
+            raise
+        finally:
+            r.release_conn()
     except Exception:
         # Clean up partial file
         try:
@@ -126,25 +411,168 @@ def download_file(url: str, dest: Path, expected_hashes: dict | None = None, pos
             pass
         raise
 
-    # verify
-    if expected_hashes:
-        if 'sha1' in expected_hashes and h1:
-            got = h1.hexdigest()
-            if got.lower() != expected_hashes['sha1'].lower():
-                raise ValueError(f"SHA1 mismatch for {dest}: expected {expected_hashes['sha1']}, got {got}")
-        if 'sha512' in expected_hashes and h512:
-            got = h512.hexdigest()
-            if got.lower() != expected_hashes['sha512'].lower():
-                raise ValueError(f"SHA512 mismatch for {dest}: expected {expected_hashes['sha512']}, got {got}")
+    _verify_hashes(dest, expected_hashes, h1, h512)
     return True
 
 
-def process_mrpack(mrpack_path: Path, outdir: Path | None = None, verify_hashes: bool = False, server_files_only: bool = False):
+def _fetch_range(url: str, fd: int, start: int, end: int, progress=None):
+    """GET bytes start..end (inclusive) of url and os.pwrite them into fd at the same offsets."""
+    headers = dict(_HTTP.headers)
+    headers['Range'] = f'bytes={start}-{end}'
+    r = _HTTP.request('GET', url, headers=headers, preload_content=False, timeout=_TIMEOUT)
+    try:
+        if r.status != 206:
+            raise RuntimeError(f"HTTP {r.status} for range {start}-{end} of {url}")
+        buf = bytearray(CHUNK_SIZE)
+        mv = memoryview(buf)
+        offset = start
+        while offset <= end:
+            n = r.readinto(buf)
+            if not n:
+                raise RuntimeError(f"Range {start}-{end} of {url} ended early at {offset}")
+            written = 0
+            while written < n:
+                written += os.pwrite(fd, mv[written:n], offset + written)
+            offset += n
+            if progress:
+                progress(n)
+    except BaseException:
+        r.close()
+        raise
+    finally:
+        r.release_conn()
+
+
+def download_file_ranged(url: str, dest: Path, expected_hashes: dict | None = None, progress=None, total_size: int | None = None, strict: bool = False, parts: int = RANGED_PARTS):
+    """Download a large file as `parts` concurrent range requests written in place with os.pwrite.
+    Hashes are computed afterwards by reading the finished file once.
+    Falls back to download_file when the server doesn't advertise byte ranges or the size doesn't match.
+    """
+    if urllib3 is None:
+        raise RuntimeError("urllib3 is required to download files. Install with: pip install -r requirements.txt")
+    if not hasattr(os, 'pwrite') or not total_size:
+        return download_file(url, dest, expected_hashes, progress, total_size, strict)
+
+    size = int(total_size)
+    head = _HTTP.request('HEAD', url, timeout=_TIMEOUT)
+    try:
+        length = int(head.headers.get('Content-Length', -1))
+    except ValueError:
+        length = -1
+    if head.status >= 400 or head.headers.get('Accept-Ranges', '').lower() != 'bytes' or length != size:
+        return download_file(url, dest, expected_hashes, progress, total_size, strict)
+
+    ensure_dir(os.fspath(dest.parent))
+    step = -(-size // parts)
+    ranges = [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+    try:
+        # unbuffered: the parts write through the raw fd with os.pwrite
+        with _create_file(dest, buffering=0) as f:
+            fd = f.fileno()
+            os.ftruncate(fd, size)
+            _preallocate(fd, size)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(ranges)) as ex:
+                jobs = [ex.submit(_fetch_range, url, fd, start, end, progress) for start, end in ranges]
+                for job in jobs:
+                    job.result()
+    except Exception:
+        # Clean up partial file
+        try:
+            if dest.exists():
+                dest.unlink()
+        except Exception:
+            pass
+        raise
+
+    h1, h512 = _make_hashers(expected_hashes, strict)
+    if h1 or h512:
+        buf = bytearray(CHUNK_SIZE)
+        mv = memoryview(buf)
+        with open(dest, 'rb') as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                for h in (h1, h512):
+                    if h:
+                        h.update(mv[:n])
+    _verify_hashes(dest, expected_hashes, h1, h512)
+    return True
+
+
+async def _download_async(client, sem, url: str, dest: Path, expected_hashes: dict | None = None, progress=None, total_size: int | None = None, strict: bool = False):
+    """asyncio counterpart of download_file using a shared httpx.AsyncClient; sem bounds concurrent downloads."""
+    async with sem:
+        ensure_dir(os.fspath(dest.parent))
+        h1, h512 = _make_hashers(expected_hashes, strict)
+        try:
+            async with client.stream('GET', url) as r:
+                if r.status_code >= 400:
+                    raise RuntimeError(f"HTTP {r.status_code} for {url}")
+                with _create_file(dest, buffering=CHUNK_SIZE) as f:
+                    if total_size:
+                        _preallocate(f.fileno(), int(total_size))
+                    async for chunk in r.aiter_bytes(CHUNK_SIZE):
+                        f.write(chunk)
+                        if h1:
+                            h1.update(chunk)
+                        if h512:
+                            h512.update(chunk)
+                        if progress:
+                            progress(len(chunk))
+                    f.truncate()
+        except Exception:
+            # Clean up partial file
+            try:
+                if dest.exists():
+                    dest.unlink()
+            except Exception:
+                pass
+            raise
+        _verify_hashes(dest, expected_hashes, h1, h512)
+        return True
+
+
+async def _download_all_async(jobs, progress, strict: bool):
+    """Download every (idx, path, url, dest, expected_hashes, size) job over one httpx.AsyncClient.
+    With h2 installed, requests to the same host are multiplexed over a single HTTP/2 connection.
+    Returns results in job order; failures are returned as exceptions.
+    """
+    limits = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+    timeout = httpx.Timeout(30, connect=5)
+    headers = {'Accept-Encoding': 'identity'}
+    sem = asyncio.Semaphore(16)
+    async with httpx.AsyncClient(http2=_HTTP2, limits=limits, timeout=timeout, headers=headers, follow_redirects=True) as client:
+        tasks = [_download_async(client, sem, url, dest, expected_hashes, progress, size, strict)
+                 for idx, path, url, dest, expected_hashes, size in jobs]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# env.server values kept by --server-files-only
+_SERVER_ENVS = frozenset({'required', 'optional', 'unknown'})
+
+
+def _server_env(entry: dict) -> str:
+    """Return the entry's env.server value, treating a missing field as 'unknown'.
+    Malformed (non-string) values come back as '' so they never match _SERVER_ENVS.
+    """
+    server_env = (entry.get('env') or {}).get('server')
+    if server_env is None:
+        return 'unknown'
+    return server_env if isinstance(server_env, str) else ''
+
+
+def process_mrpack(mrpack_path: Path, outdir: Path | None = None, verify_hashes: bool = False, server_files_only: bool = False, strict_hashes: bool = False, hash_workers: int = 0, use_async: bool = False):
     """Process the mrpack. If outdir is None, derive folder name from modrinth.index.json `name` field.
     If no modrinth.index.json is present, fall back to mrpack filename (without extension).
+    With verify_hashes and hash_workers > 1, files are downloaded and hashed in that many processes instead of threads.
+    With use_async, downloads run on asyncio with httpx instead (requires httpx).
     """
     if not mrpack_path.exists():
         raise FileNotFoundError(f"mrpack not found: {mrpack_path}")
+    # directories cached by an earlier call may have been removed since
+    with _MKDIR_LOCK:
+        _MKDIR_CACHE.clear()
 
     try:
         with zipfile.ZipFile(mrpack_path, 'r') as z:
@@ -152,8 +580,7 @@ def process_mrpack(mrpack_path: Path, outdir: Path | None = None, verify_hashes:
 
             pack_data = None
             if index_member:
-                raw = z.read(index_member)
-                pack_data = json.loads(raw.decode('utf-8'))
+                pack_data = _json_loads(z.read(index_member))
 
             # determine outdir from pack name if not provided
             if outdir is None:
@@ -183,67 +610,133 @@ def process_mrpack(mrpack_path: Path, outdir: Path | None = None, verify_hashes:
                 return
 
             # filter files if requested
-            files_to_download = []
-            for entry in files:
-                if server_files_only:
-                    env = entry.get('env', {}) or {}
-                    server_env = env.get('server')
-                    # treat missing server field as 'unknown'
-                    if server_env is None:
-                        server_env = 'unknown'
-                    if server_env not in ('required', 'optional', 'unknown'):
-                        continue
-                files_to_download.append(entry)
+            if server_files_only:
+                files_to_download = [e for e in files if _server_env(e) in _SERVER_ENVS]
+            else:
+                files_to_download = list(files)
 
             total = len(files_to_download)
             if total == 0:
                 print('No files to download after applying filters.')
                 return
 
-            # Prepare parallel downloads
-            max_workers = min(8, (os.cpu_count() or 4) * 2)
-            position_counter = itertools.count(0)
-
-            futures = {}
-            scheduled = 0
-            succeeded = 0
-            failed = 0
-            start_time = None
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
-                # start timer when we begin scheduling downloads
-                start_time = time.perf_counter()
+            # Prepare parallel downloads; start the biggest files first so a large file
+            # scheduled last doesn't leave the other workers idle at the end
+            files_to_download.sort(key=lambda e: -(e.get('fileSize') or 0))
+            # hashing in separate processes spreads sha512 over several cores; progress is then reported per finished file
+            use_processes = verify_hashes and hash_workers > 1
+            max_workers = hash_workers if use_processes else MAX_WORKERS
+
+            def skip(entry, message):
+                """Report a skipped entry and take its size off the bar so it can still reach 100%."""
+                pbar.write(message)
+                with pbar_lock:
+                    pbar.total -= entry.get('fileSize') or 0
+                    pbar.refresh()
+
+            def pending():
+                """Yield (idx, path, url, dest, expected_hashes, size) for every entry that can be downloaded."""
                 for idx, entry in enumerate(files_to_download, start=1):
                     path = entry.get('path')
                     if not path:
-                        print(f'[{idx}/{total}] Skipping file entry without path')
+                        skip(entry, f'[{idx}/{total}] Skipping file entry without path')
+                        continue
+                    if not _is_safe_relpath(path.replace('\\', '/')):
+                        skip(entry, f'[{idx}/{total}] Skipping file entry with unsafe path {path}')
                         continue
                     downloads = entry.get('downloads') or []
                     if isinstance(downloads, str):
                         downloads = [downloads]
                     if not downloads:
-                        print(f'[{idx}/{total}] No download URL for {path}; skipping')
+                        skip(entry, f'[{idx}/{total}] No download URL for {path}; skipping')
                         continue
                     url = downloads[0]
                     dest = outdir.joinpath(path)
                     expected_hashes = entry.get('hashes') if verify_hashes else None
                     size = entry.get('fileSize') or None
-                    position = next(position_counter)
-                    print(f'[{idx}/{total}] Scheduling {url} -> {dest}')
-                    fut = ex.submit(download_file, url, dest, expected_hashes, position, size)
-                    futures[fut] = (idx, total, path, url, dest)
-                    scheduled += 1
-
-                # Wait for downloads to complete and report results
-                for fut in concurrent.futures.as_completed(futures):
-                    idx, total, path, url, dest = futures[fut]
-                    try:
-                        fut.result()
-                    except Exception as e:
-                        failed += 1
-                        print(f'[{idx}/{total}] Failed to download {url}: {e}')
-                    else:
-                        succeeded += 1
-            # end with ThreadPoolExecutor
+                    yield idx, path, url, dest, expected_hashes, size
+
+            # keep at most `window` downloads in flight
+            window = 2 * max_workers
+
+            if _tqdm is None:
+                raise RuntimeError("tqdm is required for progress bars. Install with: pip install -r requirements.txt")
+            if use_async and httpx is None:
+                raise RuntimeError("httpx is required for --async. Install with: pip install httpx[http2]")
+            # one bar for the whole pack; workers report bytes through a lock instead of each drawing their own bar
+            grand_total = sum(e.get('fileSize') or 0 for e in files_to_download)
+            pbar = _tqdm(total=grand_total, unit='B', unit_scale=True, unit_divisor=1024, desc='Downloading')
+            pbar_lock = threading.Lock()
+
+            def progress(n):
+                with pbar_lock:
+                    pbar.update(n)
+
+            futures = {}
+            scheduled = 0
+            succeeded = 0
+            failed = 0
+            start_time = None
+            if use_async:
+                with pbar:
+                    start_time = time.perf_counter()
+                    jobs = []
+                    for job in pending():
+                        idx, path, url, dest, expected_hashes, size = job
+                        pbar.write(f'[{idx}/{total}] Scheduling {url} -> {dest}')
+                        jobs.append(job)
+                    scheduled = len(jobs)
+                    results = asyncio.run(_download_all_async(jobs, progress, strict_hashes))
+                    for (idx, path, url, dest, expected_hashes, size), result in zip(jobs, results):
+                        if isinstance(result, BaseException):
+                            failed += 1
+                            pbar.write(f'[{idx}/{total}] Failed to download {url}: {result}')
+                        else:
+                            succeeded += 1
+            else:
+                if use_processes:
+                    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+                else:
+                    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+                with pbar, executor as ex:
+                    # start timer when we begin scheduling downloads
+                    start_time = time.perf_counter()
+                    jobs = pending()
+                    exhausted = False
+                    while True:
+                        while not exhausted and len(futures) < window:
+                            job = next(jobs, None)
+                            if job is None:
+                                exhausted = True
+                                break
+                            idx, path, url, dest, expected_hashes, size = job
+                            pbar.write(f'[{idx}/{total}] Scheduling {url} -> {dest}')
+                            fetch = download_file_ranged if size and size > RANGED_THRESHOLD else download_file
+                            fut = ex.submit(fetch, url, dest, expected_hashes, None if use_processes else progress, size, strict_hashes)
+                            futures[fut] = (idx, total, path, url, size)
+                            scheduled += 1
+                        if not futures:
+                            break
+
+                        # Wait for at least one download to complete and report results
+                        done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                        for fut in done:
+                            idx, total, path, url, size = futures.pop(fut)
+                            try:
+                                fut.result()
+                            except Exception as e:
+                                failed += 1
+                                pbar.write(f'[{idx}/{total}] Failed to download {url}: {e}')
+                                if use_processes:
+                                    # nothing was reported for this file; drop it from the total instead
+                                    with pbar_lock:
+                                        pbar.total -= size or 0
+                                        pbar.refresh()
+                            else:
+                                succeeded += 1
+                                if use_processes:
+                                    progress(size or 0)
+                # end with executor
             end_time = time.perf_counter() if start_time is not None else None
             # Print summary of downloads
             if start_time is not None:
@@ -260,18 +753,25 @@ def main():
     parser.add_argument('mrpack', type=str, help='Path to the .mrpack (zip) file')
     parser.add_argument('--outdir', '-o', type=str, default=None, help='Output directory (defaults to name from modrinth.index.json or <mrpack-name>/ next to the mrpack file)')
     parser.add_argument('--verify-hashes', action='store_true', help='Verify sha1/sha512 hashes when present in modrinth.index.json')
+    parser.add_argument('--strict', action='store_true', help='With --verify-hashes, check sha512 as well even when sha1 is present (slower)')
+    parser.add_argument('--hash-workers', type=int, default=0, metavar='N', help='With --verify-hashes, download and hash in N processes instead of threads (helps when hashing is the bottleneck; not with --async)')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Download with asyncio and httpx (HTTP/2 when the h2 package is installed) instead of a thread pool')
     parser.add_argument('--server-files-only', action='store_true', help='Only download files whose "env.server" is required, optional or unknown')
     args = parser.parse_args()
+    if args.use_async and args.hash_workers > 1:
+        parser.error('--hash-workers cannot be combined with --async')
 
     mrpack_path = Path(args.mrpack).expanduser().resolve()
     outdir = Path(args.outdir).expanduser().resolve() if args.outdir else None
 
     try:
-        process_mrpack(mrpack_path, outdir=outdir, verify_hashes=args.verify_hashes, server_files_only=args.server_files_only)
+        process_mrpack(mrpack_path, outdir=outdir, verify_hashes=args.verify_hashes, server_files_only=args.server_files_only, strict_hashes=args.strict, hash_workers=args.hash_workers, use_async=args.use_async)
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(2)
 
 
 if __name__ == '__main__':
+    # needed for --hash-workers in frozen Windows executables
+    multiprocessing.freeze_support()
     main()